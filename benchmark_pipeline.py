@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del pipeline de salida de generar_pdf sobre un disco lento simulado.
+- Sumidero local con latencia por escritura y ancho de banda limitado
+- Compara el modo secuencial con el pipeline (compresión en pool + escritura diferida)
+
+Ejecución:
+  python benchmark_pipeline.py -n 300 --latencia-ms 20 --mb-s 5
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from generator import generar_pdf
+
+
+class SumideroLento:
+    """Fichero local que simula un disco lento: latencia fija por escritura
+    y ancho de banda limitado (bytes/s)."""
+
+    def __init__(self, ruta, latencia, bytes_seg):
+        self.f = open(ruta, "wb")
+        self.latencia = latencia
+        self.bytes_seg = bytes_seg
+
+    def write(self, datos):
+        time.sleep(self.latencia + len(datos) / self.bytes_seg)
+        return self.f.write(datos)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def medir(n, individuales, pipeline, latencia, bytes_seg):
+    def abrir(ruta):
+        return SumideroLento(ruta, latencia, bytes_seg)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            inicio = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                generar_pdf("bench.pdf", n=n, individuales=individuales,
+                            pipeline=pipeline, abrir=abrir)
+            return time.perf_counter() - inicio
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de salida PDF.")
+    parser.add_argument("-n", type=int, default=300, help="Número de facturas.")
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="Latencia por escritura (ms).")
+    parser.add_argument("--mb-s", type=float, default=5.0, help="Ancho de banda del sumidero (MB/s).")
+    args = parser.parse_args()
+
+    latencia = args.latencia_ms / 1000.0
+    bytes_seg = args.mb_s * 1024 * 1024
+    for individuales in (False, True):
+        modo = "individuales" if individuales else "archivo único"
+        for pipeline in (False, True):
+            seg = medir(args.n, individuales, pipeline, latencia, bytes_seg)
+            nombre = "pipeline" if pipeline else "secuencial"
+            print(f"{modo:14s} {nombre:10s} {seg:7.2f} s  {args.n / seg:8.1f} pág/s")
@@ -14,10 +14,22 @@ Salida:
   facturas_compras_200.pdf
 """
 
+import os
+import sys
+import json
+import time
 import random
 import math
 import argparse
+import queue
+import threading
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from reportlab import rl_config
+from reportlab.pdfbase import pdfdoc
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
@@ -147,6 +159,12 @@ def money(x):
     return s
 
 
+def parse_money(s):
+    # Inversa de money(): "1.234,56 €" -> 1234.56
+    s = s.replace("€", "").strip()
+    return float(s.replace(".", "").replace(",", "."))
+
+
 def split_lines(text, max_chars=64):
     words = text.split()
     lines, cur = [], ""
@@ -557,39 +575,441 @@ def generar_factura(i, start_date):
     }
 
 
+def iter_facturas(n=200, seed=7):
+    # Secuencia determinista (factura, layout) para una semilla dada.
+    # La usan generar_pdf y el verificador para regenerar los datos esperados.
+    random.seed(seed)
+    start_date = date(2025, 9, 1)
+    for i in range(1, n + 1):
+        factura = generar_factura(i, start_date)
+        layout = random.choices(LAYOUTS, weights=LAYOUT_WEIGHTS, k=1)[0]
+        yield i, factura, layout
+
+
+# -----------------------------
+# Pipeline de salida (compresión + escritura diferida)
+# -----------------------------
+TAM_BUFFER = 1024 * 1024  # las escrituras se agrupan hasta 1 MiB
+MAX_PENDIENTES = 64  # límite de páginas en compresión y de bloques en cola de escritura
+
+
+class EscritorDiferido:
+    """Hilo de escritura en segundo plano alimentado por una cola acotada.
+
+    Recibe bloques (ruta, datos) y agrupa los consecutivos de una misma ruta
+    en escrituras de hasta tam_buffer bytes. abrir(ruta) devuelve el objeto
+    fichero de destino (por defecto, open(ruta, "wb")).
+    """
+
+    _FIN = object()
+
+    def __init__(self, abrir=None, max_cola=MAX_PENDIENTES, tam_buffer=TAM_BUFFER):
+        self.abrir = abrir or (lambda ruta: open(ruta, "wb"))
+        self.tam_buffer = tam_buffer
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.bytes_escritos = 0
+        self.error = None
+        self._notificado = False
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-pdf", daemon=True)
+        self._hilo.start()
+
+    def escribir(self, ruta, datos):
+        # Bloquea si la cola está llena: así la memoria pendiente queda acotada
+        self.comprobar()
+        self.cola.put((ruta, datos))
+
+    def comprobar(self):
+        # Relanza en el productor el primer error de escritura, para no seguir generando
+        if self.error is not None:
+            self._notificado = True
+            raise self.error
+
+    def cerrar(self):
+        self.cola.put(self._FIN)
+        self._hilo.join()
+        if self.error is not None and not self._notificado:
+            self._notificado = True
+            raise self.error
+
+    def _bucle(self):
+        ruta_actual, f, buf = None, None, []
+        try:
+            while True:
+                item = self.cola.get()
+                if item is self._FIN:
+                    break
+                if self.error is not None:
+                    # Tras un error se sigue vaciando la cola para no bloquear al productor
+                    continue
+                ruta, datos = item
+                try:
+                    if ruta != ruta_actual:
+                        anterior, f = f, None
+                        try:
+                            self._volcar(anterior, buf)
+                        finally:
+                            if anterior is not None:
+                                anterior.close()
+                        f, ruta_actual = self.abrir(ruta), ruta
+                    buf.append(datos)
+                    if sum(map(len, buf)) >= self.tam_buffer or self.cola.empty():
+                        self._volcar(f, buf)
+                except Exception as exc:
+                    self.error = exc
+                    buf.clear()
+            if self.error is None:
+                self._volcar(f, buf)
+        except Exception as exc:
+            self.error = self.error or exc
+        finally:
+            if f is not None:
+                try:
+                    f.close()
+                except Exception as exc:
+                    self.error = self.error or exc
+
+    def _volcar(self, f, buf):
+        if buf:
+            datos = b"".join(buf)
+            f.write(datos)
+            self.bytes_escritos += len(datos)
+            buf.clear()
+
+
+class _FlateDiferido:
+    # Filtro FlateDecode cuyo resultado ya se ha calculado en el pool de compresión
+    pdfname = "FlateDecode"
+
+    def __init__(self, futuro):
+        self.futuro = futuro
+
+    def encode(self, text):
+        return self.futuro.result()
+
+
+def _comprimir_pagina(c, pool):
+    # Tras showPage(): lanza en el pool la compresión zlib (libera el GIL) del
+    # contenido de la última página y deja el resultado enlazado a su stream.
+    # Devuelve None si la compresión de páginas está desactivada en el canvas.
+    page = c._doc.Pages.pages[-1]
+    if not page.compression:
+        return None
+    futuro = pool.submit(zlib.compress, page.stream.encode("utf8"))
+    flate = _FlateDiferido(futuro)
+    filtros = [pdfdoc.PDFBase85Encode, flate] if rl_config.useA85 else [flate]
+    page.Contents = pdfdoc.PDFStream(content=b"", filters=filtros)
+    page.stream = None
+    return futuro
+
+
+# -----------------------------
+# Métricas de progreso
+# -----------------------------
+def _rss_bytes():
+    # Memoria residente actual (Linux); si no hay /proc, el pico vía resource
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # macOS: bytes; resto: KiB
+
+
+class MetricasGeneracion:
+    """Métricas de una ejecución de generar_pdf, publicadas periódicamente.
+
+    registrar() se llama una vez por factura y sólo incrementa contadores;
+    cada `muestreo` facturas consulta el reloj y, si han pasado `intervalo`
+    segundos, recalcula el estado: lo reescribe en `ruta_estado` (JSON) y lo
+    sirve en formato Prometheus en http://127.0.0.1:<puerto>/metrics.
+    """
+
+    def __init__(self, ruta_estado=None, puerto=None, intervalo=2.0, ventana=30.0, muestreo=32):
+        self.ruta_estado = ruta_estado
+        self.puerto = puerto
+        self.intervalo = intervalo
+        self.ventana = ventana
+        self.muestreo = muestreo
+        self.fuente_bytes = None  # callable opcional con los bytes escritos hasta ahora
+        self.bytes_escritos = 0
+        self.bytes_comprimidos = 0  # contenido de página ya comprimido (archivo único, pipeline)
+        self.estado = {}
+        self._servidor = None
+        self._hilo_servidor = None
+
+    def iniciar(self, total):
+        self.total = total
+        self.facturas = 0
+        self.bytes_escritos = 0
+        self.bytes_comprimidos = 0
+        self.fuente_bytes = None
+        self.layouts = {layout.__name__: 0 for layout in LAYOUTS}
+        self.inicio = time.time()
+        self._muestras = deque([(time.monotonic(), 0)])
+        self._proxima = self._muestras[0][0] + self.intervalo
+        # El puerto se reserva antes de escribir nada: si está ocupado, la ejecución
+        # falla sin dejar un fichero de estado a medias. Se empieza a servir después
+        # de publicar, para que una consulta nunca vea self.estado vacío.
+        if self.puerto is not None and self._servidor is None:
+            self._servidor = _servidor_metricas(self)
+        try:
+            self.publicar()
+        except Exception:
+            self._cerrar_servidor()
+            raise
+        if self._servidor is not None and self._hilo_servidor is None:
+            self._hilo_servidor = threading.Thread(
+                target=self._servidor.serve_forever, name="metricas-http", daemon=True)
+            self._hilo_servidor.start()
+
+    def registrar(self, layout):
+        self.facturas += 1
+        self.layouts[layout.__name__] += 1
+        if self.facturas % self.muestreo == 0 and time.monotonic() >= self._proxima:
+            self.publicar()
+
+    def finalizar(self):
+        if self.fuente_bytes is not None:
+            self.bytes_escritos = self.fuente_bytes()
+            self.fuente_bytes = None
+        self.publicar(terminado=self.facturas >= self.total)
+        self._cerrar_servidor()
+
+    def _cerrar_servidor(self):
+        if self._servidor is not None:
+            if self._hilo_servidor is not None:
+                self._servidor.shutdown()
+                self._hilo_servidor = None
+            self._servidor.server_close()
+            self._servidor = None
+
+    def publicar(self, terminado=False):
+        ahora = time.monotonic()
+        self._proxima = ahora + self.intervalo
+        muestras = self._muestras
+        muestras.append((ahora, self.facturas))
+        while len(muestras) > 2 and ahora - muestras[1][0] >= self.ventana:
+            muestras.popleft()
+        t0, n0 = muestras[0]
+        pag_seg = (self.facturas - n0) / (ahora - t0) if ahora > t0 else 0.0
+        restantes = self.total - self.facturas
+        if self.fuente_bytes is not None:
+            self.bytes_escritos = self.fuente_bytes()
+
+        self.estado = {
+            "facturas": self.facturas,
+            "paginas": self.facturas,  # 1 folio por factura
+            "total": self.total,
+            "paginas_seg": round(pag_seg, 2),
+            "eta_seg": round(restantes / pag_seg, 1) if pag_seg > 0 else None,
+            "bytes_escritos": self.bytes_escritos,
+            "bytes_comprimidos": self.bytes_comprimidos,
+            "rss_bytes": _rss_bytes(),
+            "layouts": {
+                nombre: {
+                    "facturas": k,
+                    "proporcion": round(k / self.facturas, 4) if self.facturas else 0.0,
+                    "peso": peso,
+                }
+                for (nombre, k), peso in zip(self.layouts.items(), LAYOUT_WEIGHTS)
+            },
+            "inicio": self.inicio,
+            "actualizado": time.time(),
+            "terminado": terminado,
+        }
+        if self.ruta_estado:
+            # Reescritura atómica: los lectores nunca ven un JSON a medias
+            tmp = f"{self.ruta_estado}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.estado, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.ruta_estado)
+
+    def prometheus(self):
+        e = self.estado
+        # Calculado en cada consulta: crece si el bucle principal se detiene
+        sin_avance = 0.0 if e["terminado"] else time.time() - e["actualizado"]
+        lineas = [
+            "# HELP facturas_generadas_total Facturas generadas.",
+            "# TYPE facturas_generadas_total counter",
+            f"facturas_generadas_total {e['facturas']}",
+            "# HELP facturas_objetivo Facturas a generar en esta ejecución.",
+            "# TYPE facturas_objetivo gauge",
+            f"facturas_objetivo {e['total']}",
+            "# HELP facturas_paginas_por_segundo Páginas/s en la ventana móvil.",
+            "# TYPE facturas_paginas_por_segundo gauge",
+            f"facturas_paginas_por_segundo {e['paginas_seg']}",
+            "# HELP facturas_bytes_escritos_total Bytes de PDF escritos.",
+            "# TYPE facturas_bytes_escritos_total counter",
+            f"facturas_bytes_escritos_total {e['bytes_escritos']}",
+            "# HELP facturas_bytes_comprimidos_total Bytes de contenido de página ya comprimidos.",
+            "# TYPE facturas_bytes_comprimidos_total counter",
+            f"facturas_bytes_comprimidos_total {e['bytes_comprimidos']}",
+            "# HELP facturas_segundos_sin_actualizar Segundos desde la última muestra.",
+            "# TYPE facturas_segundos_sin_actualizar gauge",
+            f"facturas_segundos_sin_actualizar {sin_avance:.1f}",
+        ]
+        if e["eta_seg"] is not None:
+            lineas += [
+                "# HELP facturas_eta_segundos Tiempo restante estimado.",
+                "# TYPE facturas_eta_segundos gauge",
+                f"facturas_eta_segundos {e['eta_seg']}",
+            ]
+        if e["rss_bytes"] is not None:
+            lineas += [
+                "# HELP facturas_rss_bytes Memoria residente del proceso.",
+                "# TYPE facturas_rss_bytes gauge",
+                f"facturas_rss_bytes {e['rss_bytes']}",
+            ]
+        lineas += [
+            "# HELP facturas_layout_total Facturas generadas por layout.",
+            "# TYPE facturas_layout_total counter",
+        ]
+        lineas += [f'facturas_layout_total{{layout="{k}"}} {v["facturas"]}' for k, v in e["layouts"].items()]
+        lineas += [
+            "# HELP facturas_layout_peso Peso configurado en LAYOUT_WEIGHTS.",
+            "# TYPE facturas_layout_peso gauge",
+        ]
+        lineas += [f'facturas_layout_peso{{layout="{k}"}} {v["peso"]}' for k, v in e["layouts"].items()]
+        return "\n".join(lineas) + "\n"
+
+
+def _servidor_metricas(metricas):
+    # Endpoint de sólo lectura en localhost; crearlo reserva el puerto y
+    # MetricasGeneracion lo atiende en un hilo aparte
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = metricas.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, format, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", metricas.puerto), Handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
 # -----------------------------
 # Generación PDF
 # -----------------------------
-def generar_pdf(path="facturas_compras_200.pdf", n=200, seed=7, individuales=False):
-    random.seed(seed)
-    start_date = date(2025, 9, 1)
+def generar_pdf(path="facturas_compras_200.pdf", n=200, seed=7, individuales=False,
+                pipeline=True, hilos=None, abrir=None, metricas=None):
+    if metricas is not None:
+        metricas.iniciar(n)
+    try:
+        if pipeline:
+            _generar_pdf_pipeline(path, n, seed, individuales, hilos, abrir, metricas)
+        else:
+            _generar_pdf_secuencial(path, n, seed, individuales, abrir, metricas)
+    finally:
+        if metricas is not None:
+            metricas.finalizar()
+
 
+def _generar_pdf_secuencial(path, n, seed, individuales, abrir, metricas):
     if individuales:
         # Modo de archivos individuales
-        for i in range(1, n + 1):
+        for i, factura, layout in iter_facturas(n, seed):
             individual_path = f"factura_{i}.pdf"
-            c = canvas.Canvas(individual_path, pagesize=A4)
+            destino = abrir(individual_path) if abrir else individual_path
+            c = canvas.Canvas(destino, pagesize=A4)
 
-            factura = generar_factura(i, start_date)
-            layout = random.choices(LAYOUTS, weights=LAYOUT_WEIGHTS, k=1)[0]
             layout(c, factura)
 
             c.showPage()
             c.save()
+            if abrir:
+                destino.close()
+            if metricas is not None:
+                if not abrir:
+                    metricas.bytes_escritos += os.path.getsize(individual_path)
+                metricas.registrar(layout)
         print(f"OK -> Generados {n} archivos PDF individuales (ej: factura_1.pdf)")
     else:
         # Modo de archivo único
-        c = canvas.Canvas(path, pagesize=A4)
-        for i in range(1, n+1):
-            factura = generar_factura(i, start_date)
-
-            layout = random.choices(LAYOUTS, weights=LAYOUT_WEIGHTS, k=1)[0]
+        destino = abrir(path) if abrir else path
+        c = canvas.Canvas(destino, pagesize=A4)
+        for i, factura, layout in iter_facturas(n, seed):
             layout(c, factura)
 
             # 1 folio por factura
             c.showPage()
+            if metricas is not None:
+                metricas.registrar(layout)
 
         c.save()
+        if abrir:
+            destino.close()
+        elif metricas is not None:
+            metricas.bytes_escritos = os.path.getsize(path)
+        print(f"OK -> {path} (páginas: {n})")
+
+
+def _generar_pdf_pipeline(path, n, seed, individuales, hilos, abrir, metricas):
+    # El hilo principal dibuja, el pool comprime y EscritorDiferido escribe
+    escritor = EscritorDiferido(abrir)
+    if metricas is not None:
+        metricas.fuente_bytes = lambda: escritor.bytes_escritos
+    pendientes = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="zlib-pdf") as pool:
+            if individuales:
+                # Cada PDF se serializa (y comprime) completo en el pool
+                for i, factura, layout in iter_facturas(n, seed):
+                    escritor.comprobar()
+                    individual_path = f"factura_{i}.pdf"
+                    c = canvas.Canvas(individual_path, pagesize=A4)
+                    layout(c, factura)
+                    c.showPage()
+                    pendientes.append((individual_path, pool.submit(c.getpdfdata)))
+                    if metricas is not None:
+                        metricas.registrar(layout)
+                    while len(pendientes) >= MAX_PENDIENTES:
+                        ruta, futuro = pendientes.popleft()
+                        escritor.escribir(ruta, futuro.result())
+                while pendientes:
+                    ruta, futuro = pendientes.popleft()
+                    escritor.escribir(ruta, futuro.result())
+            else:
+                c = canvas.Canvas(path, pagesize=A4)
+                for i, factura, layout in iter_facturas(n, seed):
+                    layout(c, factura)
+
+                    # 1 folio por factura
+                    c.showPage()
+                    futuro = _comprimir_pagina(c, pool)
+                    if futuro is not None:
+                        pendientes.append(futuro)
+                    if metricas is not None:
+                        metricas.registrar(layout)
+                    while len(pendientes) >= MAX_PENDIENTES:
+                        comprimido = pendientes.popleft().result()
+                        if metricas is not None:
+                            # Avance de E/S aproximado: el PDF único sólo se escribe al guardar
+                            metricas.bytes_comprimidos += len(comprimido)
+                while pendientes:
+                    comprimido = pendientes.popleft().result()
+                    if metricas is not None:
+                        metricas.bytes_comprimidos += len(comprimido)
+                escritor.escribir(path, c.getpdfdata())
+    finally:
+        escritor.cerrar()
+
+    if individuales:
+        print(f"OK -> Generados {n} archivos PDF individuales (ej: factura_1.pdf)")
+    else:
         print(f"OK -> {path} (páginas: {n})")
 
 
@@ -603,11 +1023,38 @@ if __name__ == "__main__":
         default=None,
         help="Genera N facturas en archivos PDF separados. Si no se especifica N, se generan 10."
     )
+    parser.add_argument(
+        "--sin-pipeline",
+        action="store_true",
+        help="Dibuja, comprime y escribe secuencialmente en el hilo principal."
+    )
+    parser.add_argument(
+        "--estado",
+        default=None,
+        help="Ruta de un fichero JSON de estado que se reescribe durante la generación."
+    )
+    parser.add_argument(
+        "--metricas-puerto",
+        type=int,
+        default=None,
+        help="Sirve métricas Prometheus en http://127.0.0.1:PUERTO/metrics."
+    )
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=2.0,
+        help="Segundos entre actualizaciones de las métricas (por defecto: 2)."
+    )
     args = parser.parse_args()
 
+    metricas = None
+    if args.estado or args.metricas_puerto is not None:
+        metricas = MetricasGeneracion(args.estado, args.metricas_puerto, intervalo=args.intervalo)
+
     if args.individuales is not None:
         # Generar N facturas individuales
-        generar_pdf(n=args.individuales, individuales=True)
+        generar_pdf(n=args.individuales, individuales=True, pipeline=not args.sin_pipeline,
+                    metricas=metricas)
     else:
         # Comportamiento por defecto: 200 facturas en un solo archivo
-        generar_pdf()
+        generar_pdf(pipeline=not args.sin_pipeline, metricas=metricas)
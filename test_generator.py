@@ -1,6 +1,9 @@
 import os
+import json
+import urllib.request
 import pytest
-from generator import calcular_totales, generar_pdf, generar_factura
+from generator import (calcular_totales, generar_pdf, generar_factura, EscritorDiferido,
+                       MetricasGeneracion, LAYOUTS)
 from datetime import date
 
 # Pruebas Unitarias para calcular_totales
@@ -72,6 +75,205 @@ def test_generar_pdf_una_factura(pdf_cleanup):
     # Opcional: verificar que el archivo no está vacío
     assert os.path.getsize(test_pdf_path) > 0, "El archivo PDF está vacío"
 
+def test_generar_pdf_sin_pipeline(pdf_cleanup):
+    """Prueba que el modo secuencial (sin pipeline) sigue generando el PDF."""
+    test_pdf_path = "test_factura_secuencial.pdf"
+    pdf_cleanup.append(test_pdf_path)
+
+    generar_pdf(path=test_pdf_path, n=3, seed=42, pipeline=False)
+
+    assert os.path.exists(test_pdf_path)
+    assert os.path.getsize(test_pdf_path) > 0
+
+def test_generar_pdf_individuales_pipeline(tmp_path, monkeypatch):
+    """Prueba que el pipeline genera un PDF completo por factura en modo individual."""
+    monkeypatch.chdir(tmp_path)
+
+    generar_pdf(n=3, seed=42, individuales=True, hilos=2)
+
+    for i in range(1, 4):
+        with open(tmp_path / f"factura_{i}.pdf", "rb") as f:
+            datos = f.read()
+        assert datos.startswith(b"%PDF")
+        assert datos.rstrip().endswith(b"%%EOF")
+
+@pytest.mark.parametrize("compresion", [1, 0])
+@pytest.mark.parametrize("individuales", [False, True])
+def test_generar_pdf_pipeline_identico_a_secuencial(tmp_path, monkeypatch, individuales, compresion):
+    """Prueba que el pipeline produce los mismos bytes que el modo secuencial.
+
+    _comprimir_pagina usa internos de reportlab; esta prueba detecta si cambian.
+    """
+    from reportlab import rl_config
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    monkeypatch.setattr(rl_config, "pageCompression", compresion)
+    salidas = {}
+    for pipeline in (False, True):
+        d = tmp_path / str(pipeline)
+        d.mkdir()
+        monkeypatch.chdir(d)
+        generar_pdf(path="f.pdf", n=3, seed=42, individuales=individuales, pipeline=pipeline)
+        salidas[pipeline] = {p.name: p.read_bytes() for p in d.iterdir()}
+
+    assert salidas[True] == salidas[False]
+
+# Pruebas Unitarias para EscritorDiferido
+class SumideroMemoria:
+    """Destino en memoria que registra cada llamada a write()."""
+    def __init__(self):
+        self.escrituras = []
+        self.cerrado = False
+    def write(self, datos):
+        self.escrituras.append(datos)
+    def close(self):
+        self.cerrado = True
+
+def test_escritor_diferido_agrupa_escrituras():
+    """Prueba que los bloques de una misma ruta se escriben en orden y agrupados."""
+    sumideros = {}
+    def abrir(ruta):
+        sumideros[ruta] = SumideroMemoria()
+        return sumideros[ruta]
+
+    escritor = EscritorDiferido(abrir, tam_buffer=1024)
+    for i in range(20):
+        escritor.escribir("a.pdf", b"%02d" % i)
+    escritor.escribir("b.pdf", b"fin")
+    escritor.cerrar()
+
+    a = sumideros["a.pdf"]
+    assert b"".join(a.escrituras) == b"".join(b"%02d" % i for i in range(20))
+    assert len(a.escrituras) <= 20
+    assert a.cerrado and sumideros["b.pdf"].cerrado
+    assert escritor.bytes_escritos == 43
+
+def test_escritor_diferido_propaga_errores():
+    """Prueba que un error de escritura se relanza al cerrar el escritor."""
+    def abrir(ruta):
+        raise OSError("disco lleno")
+
+    escritor = EscritorDiferido(abrir)
+    escritor.escribir("a.pdf", b"datos")
+    with pytest.raises(OSError):
+        escritor.cerrar()
+
+# Pruebas para MetricasGeneracion
+def test_metricas_estado_json(tmp_path):
+    """Prueba que el fichero de estado refleja la ejecución completa."""
+    ruta_estado = tmp_path / "estado.json"
+    metricas = MetricasGeneracion(str(ruta_estado), intervalo=0.0, muestreo=1)
+
+    generar_pdf(path=str(tmp_path / "m.pdf"), n=6, seed=42, metricas=metricas)
+
+    estado = json.loads(ruta_estado.read_text(encoding="utf-8"))
+    assert estado["facturas"] == 6 and estado["total"] == 6
+    assert estado["terminado"] is True
+    assert estado["bytes_escritos"] == os.path.getsize(tmp_path / "m.pdf")
+    assert sum(v["facturas"] for v in estado["layouts"].values()) == 6
+    assert set(estado["layouts"]) == {layout.__name__ for layout in LAYOUTS}
+
+def test_metricas_reutilizables(tmp_path, monkeypatch):
+    """Prueba que reutilizar MetricasGeneracion no arrastra bytes de la ejecución anterior."""
+    monkeypatch.chdir(tmp_path)
+    metricas = MetricasGeneracion()
+
+    generar_pdf(path="a.pdf", n=3, seed=42, metricas=metricas)
+    assert metricas.estado["bytes_escritos"] == os.path.getsize("a.pdf")
+
+    generar_pdf(n=2, seed=42, individuales=True, pipeline=False, metricas=metricas)
+    esperado = sum(os.path.getsize(f"factura_{i}.pdf") for i in (1, 2))
+    assert metricas.estado["bytes_escritos"] == esperado
+    assert metricas.fuente_bytes is None
+
+def test_metricas_bytes_comprimidos_archivo_unico(tmp_path, monkeypatch):
+    """Prueba que en archivo único con pipeline se cuentan todas las páginas comprimidas."""
+    import generator
+    metricas = MetricasGeneracion()
+
+    generar_pdf(path=str(tmp_path / "m.pdf"), n=5, seed=42, metricas=metricas)
+    total = metricas.estado["bytes_comprimidos"]
+    assert 5 < generator.MAX_PENDIENTES
+    assert total > 0
+
+    monkeypatch.setattr(generator, "MAX_PENDIENTES", 2)
+    generar_pdf(path=str(tmp_path / "m.pdf"), n=5, seed=42, metricas=metricas)
+    assert metricas.estado["bytes_comprimidos"] == total
+
+def test_metricas_puerto_ocupado(tmp_path):
+    """Prueba que un puerto ocupado falla antes de escribir el fichero de estado."""
+    import socket
+    ocupado = socket.socket()
+    ocupado.bind(("127.0.0.1", 0))
+    ocupado.listen()
+    try:
+        ruta_estado = tmp_path / "estado.json"
+        metricas = MetricasGeneracion(str(ruta_estado), puerto=ocupado.getsockname()[1])
+        with pytest.raises(OSError):
+            generar_pdf(path=str(tmp_path / "m.pdf"), n=2, seed=42, metricas=metricas)
+    finally:
+        ocupado.close()
+
+    assert not ruta_estado.exists()
+    assert not (tmp_path / "m.pdf").exists()
+
+def test_metricas_muestreo():
+    """Prueba que registrar() sólo publica cada `muestreo` facturas."""
+    metricas = MetricasGeneracion(intervalo=0.0, muestreo=4)
+    metricas.iniciar(10)
+    for _ in range(3):
+        metricas.registrar(LAYOUTS[0])
+    assert metricas.estado["facturas"] == 0
+    metricas.registrar(LAYOUTS[0])
+    assert metricas.estado["facturas"] == 4
+
+def test_metricas_prometheus(tmp_path):
+    """Prueba el endpoint Prometheus en localhost durante la generación."""
+    metricas = MetricasGeneracion(puerto=0)
+    metricas.iniciar(3)
+    try:
+        puerto = metricas._servidor.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics") as r:
+            assert "facturas_generadas_total 0" in r.read().decode("utf-8")
+        metricas.registrar(LAYOUTS[1])
+        metricas.publicar()
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics") as r:
+            texto = r.read().decode("utf-8")
+    finally:
+        metricas.finalizar()
+
+    assert "facturas_generadas_total 1" in texto
+    assert 'facturas_layout_total{layout="layout_1"} 1' in texto
+    assert "# TYPE facturas_paginas_por_segundo gauge" in texto
+
+def test_generar_pdf_pipeline_se_detiene_ante_error(tmp_path, monkeypatch):
+    """Prueba que un error de escritura detiene la generación sin esperar al final."""
+    import generator
+    monkeypatch.chdir(tmp_path)
+    generadas = []
+    original = generator.generar_factura
+    monkeypatch.setattr(generator, "generar_factura",
+                        lambda i, start: generadas.append(i) or original(i, start))
+    def abrir(ruta):
+        raise OSError("disco lleno")
+
+    with pytest.raises(OSError):
+        generar_pdf(n=300, individuales=True, abrir=abrir)
+
+    assert len(generadas) < 300
+
+def test_escritor_diferido_cierra_tras_error():
+    """Prueba que el fichero se cierra aunque falle la última escritura."""
+    class SumideroRoto(SumideroMemoria):
+        def write(self, datos):
+            raise OSError("disco lleno")
+
+    sumidero = SumideroRoto()
+    escritor = EscritorDiferido(lambda ruta: sumidero)
+    escritor.escribir("a.pdf", b"datos")
+    with pytest.raises(OSError):
+        escritor.cerrar()
+    assert sumidero.cerrado
+
 def test_generar_factura_estructura():
     """Prueba que la función generar_factura devuelve la estructura de datos esperada."""
     start_date = date(2023, 1, 1)
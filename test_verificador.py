@@ -0,0 +1,96 @@
+import os
+import pytest
+from generator import money, parse_money, generar_pdf
+from verificador import extraer_importes, verificar_pdf
+
+# Pruebas Unitarias para el parseo de importes
+def test_parse_money_inversa_de_money():
+    """Prueba que parse_money deshace el formato español de money()."""
+    for x in (0.0, 0.51, 12.7, 1234.56, 1234567.89):
+        assert parse_money(money(x)) == pytest.approx(x)
+    assert parse_money("1.234,56 €") == pytest.approx(1234.56)
+
+def test_extraer_importes():
+    """Prueba la extracción de bases, cuotas y total del texto de una página."""
+    texto = (
+        "Nº F-2025-00002  |  Fecha: 11/10/2025\nResumen IVA\n"
+        "Base 21%:\n1.539,78 €\nCuota 21%:\n323,35 €\n"
+        "Base 4%:\n49,84 €\nCuota 4%:\n1,99 €\nTOTAL FACTURA:\n1.914,96 €\n"
+    )
+    importes = extraer_importes(texto)
+
+    assert importes["numero"] == "F-2025-00002"
+    assert importes["bases"] == {21: pytest.approx(1539.78), 4: pytest.approx(49.84)}
+    assert importes["cuotas"] == {21: pytest.approx(323.35), 4: pytest.approx(1.99)}
+    assert importes["total"] == pytest.approx(1914.96)
+
+# Pruebas de Integración para la verificación de PDF
+@pytest.fixture
+def pdf_verificado():
+    """Fixture que genera un PDF de prueba y lo elimina al terminar."""
+    test_pdf_path = "test_factura_verificada.pdf"
+    generar_pdf(path=test_pdf_path, n=5, seed=42)
+    yield test_pdf_path
+    if os.path.exists(test_pdf_path):
+        os.remove(test_pdf_path)
+
+def test_verificar_pdf_sin_discrepancias(pdf_verificado):
+    """Prueba que un PDF recién generado coincide con los totales regenerados."""
+    res = verificar_pdf(pdf_verificado, n=5, seed=42, procesos=2)
+
+    assert res["paginas"] == 5
+    assert res["discrepancias"] == []
+
+def test_verificar_pdf_semilla_distinta(pdf_verificado):
+    """Prueba que se detectan discrepancias si los datos esperados no coinciden."""
+    res = verificar_pdf(pdf_verificado, n=5, seed=43, procesos=1)
+
+    assert res["paginas"] == 5
+    assert any(campo == "total" for _, _, campo, _, _ in res["discrepancias"])
+
+def test_verificar_pdf_paginas_de_menos(pdf_verificado):
+    """Prueba que sólo se cuentan las páginas realmente leídas."""
+    res = verificar_pdf(pdf_verificado, n=6, seed=42, procesos=1)
+
+    assert res["paginas"] == 5
+    campos = [campo for _, _, campo, _, _ in res["discrepancias"]]
+    assert "paginas" in campos and "lectura" in campos
+
+def test_verificar_pdf_inexistente():
+    """Prueba que un PDF ausente se informa como discrepancia de lectura."""
+    res = verificar_pdf("no_existe.pdf", n=2, seed=42, procesos=1)
+
+    assert res["paginas"] == 0
+    assert [campo for _, _, campo, _, _ in res["discrepancias"]] == ["lectura", "paginas"]
+
+def test_verificar_pdf_individual_truncado(tmp_path, monkeypatch):
+    """Prueba que un PDF individual truncado no interrumpe la verificación."""
+    monkeypatch.chdir(tmp_path)
+    generar_pdf(n=3, seed=42, individuales=True)
+    datos = (tmp_path / "factura_2.pdf").read_bytes()
+    (tmp_path / "factura_2.pdf").write_bytes(datos[:len(datos) // 3])
+
+    res = verificar_pdf(n=3, seed=42, individuales=True, procesos=1)
+
+    assert res["paginas"] == 2
+    assert [(p, campo) for p, _, campo, _, _ in res["discrepancias"]] == [(2, "lectura")]
+
+def test_verificar_pdf_stream_corrupto(pdf_verificado):
+    """Prueba que un stream de página dañado se informa y no aborta la verificación."""
+    with open(pdf_verificado, "rb") as f:
+        datos = bytearray(f.read())
+    # Contenido de la tercera página: sobrescribir bytes en mitad de su stream
+    marca = b">>\nstream\n"
+    inicios = [i + len(marca) for i in range(len(datos)) if datos.startswith(marca, i)]
+    fines = [datos.index(b"endstream", i) for i in inicios]
+    paginas = [(a, b) for a, b in zip(inicios, fines) if b - a > 500]
+    a, b = paginas[2]
+    medio = (a + b) // 2
+    datos[medio:medio + 40] = b"\xff" * 40
+    with open(pdf_verificado, "wb") as f:
+        f.write(datos)
+
+    res = verificar_pdf(pdf_verificado, n=5, seed=42, procesos=2)
+
+    assert res["paginas"] + sum(c == "lectura" for _, _, c, _, _ in res["discrepancias"]) == 5
+    assert any(c == "lectura" for _, _, c, _, _ in res["discrepancias"])
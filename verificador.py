@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Verificador de facturas generadas en PDF.
+- Extrae el texto de cada página en paralelo (pool de procesos)
+- Lee los importes impresos por draw_totals_box (bases, cuotas y TOTAL FACTURA)
+- Los compara con calcular_totales regenerando las facturas con la misma semilla
+
+Requisitos:
+  pip install reportlab pypdf
+Ejecución:
+  python verificador.py facturas_compras_200.pdf
+  python verificador.py --individuales 10
+"""
+
+import re
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+
+from generator import iter_facturas, parse_money
+
+RE_NUMERO = re.compile(r"Nº (F-\d{4}-\d+)")
+RE_IVA = re.compile(r"(Base|Cuota) (\d+)%:\s*([\d.,]+) €")
+RE_TOTAL = re.compile(r"TOTAL FACTURA:\s*([\d.,]+) €")
+
+# Último lector abierto en el proceso, para no reparsear el xref del PDF único en cada bloque
+_LECTORES = {}
+
+
+def extraer_importes(texto):
+    # Importes del resumen de una página: {"numero", "bases", "cuotas", "total"}
+    numero = RE_NUMERO.search(texto)
+    total = RE_TOTAL.search(texto)
+    bases, cuotas = {}, {}
+    for tipo, pct, importe in RE_IVA.findall(texto):
+        destino = bases if tipo == "Base" else cuotas
+        destino[int(pct)] = parse_money(importe)
+    return {
+        "numero": numero.group(1) if numero else None,
+        "bases": bases,
+        "cuotas": cuotas,
+        "total": parse_money(total.group(1)) if total else None,
+    }
+
+
+def importes_esperados(factura):
+    # Mismo formato que extraer_importes, a partir de los totales de la factura
+    bases, cuotas, subtotal, total_iva, total = factura["totales"]
+    return {
+        "numero": factura["numero"],
+        "bases": {int(iva*100): round(v, 2) for iva, v in bases.items()},
+        "cuotas": {int(iva*100): round(v, 2) for iva, v in cuotas.items()},
+        "total": round(total, 2),
+    }
+
+
+def comparar(pagina, esperado, impreso):
+    # Lista de discrepancias (pagina, numero, campo, esperado, impreso)
+    errores = []
+    numero = esperado["numero"]
+    if impreso["numero"] != numero:
+        errores.append((pagina, numero, "numero", numero, impreso["numero"]))
+    for campo in ("bases", "cuotas"):
+        for pct in sorted(set(esperado[campo]) | set(impreso[campo]), reverse=True):
+            e = esperado[campo].get(pct)
+            p = impreso[campo].get(pct)
+            if e is None or p is None or round(p, 2) != e:
+                errores.append((pagina, numero, f"{campo} {pct}%", e, p))
+    if impreso["total"] is None or round(impreso["total"], 2) != esperado["total"]:
+        errores.append((pagina, numero, "total", esperado["total"], impreso["total"]))
+    return errores
+
+
+def _lector(path):
+    reader = _LECTORES.get(path)
+    if reader is None:
+        # En modo individual cada fichero se abre una sola vez: no acumular lectores
+        _LECTORES.clear()
+        reader = _LECTORES[path] = PdfReader(path)
+    return reader
+
+
+def _verificar_bloque(tareas):
+    # tareas: [(path, indice_pagina, pagina, esperado)] -> (páginas leídas, discrepancias)
+    leidas, errores = 0, []
+    for path, idx, pagina, esperado in tareas:
+        try:
+            texto = _lector(path).pages[idx].extract_text()
+        except Exception as exc:
+            # Un PDF ausente, truncado o corrupto es una discrepancia más, no un fallo.
+            # pypdf lanza tipos muy distintos (ValueError en ASCII85, zlib.error,
+            # KeyError...) según dónde esté el daño.
+            errores.append((pagina, esperado["numero"], "lectura", None, str(exc)))
+            continue
+        leidas += 1
+        errores.extend(comparar(pagina, esperado, extraer_importes(texto)))
+    return leidas, errores
+
+
+def _tareas(path, n, seed, individuales):
+    for i, factura, _layout in iter_facturas(n, seed):
+        if individuales:
+            yield f"factura_{i}.pdf", 0, i, importes_esperados(factura)
+        else:
+            yield path, i - 1, i, importes_esperados(factura)
+
+
+def _bloques(tareas, tam):
+    bloque = []
+    for t in tareas:
+        bloque.append(t)
+        if len(bloque) == tam:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def verificar_pdf(path="facturas_compras_200.pdf", n=200, seed=7, individuales=False,
+                  procesos=None, bloque=256):
+    """Verifica n facturas generadas con generar_pdf(path, n, seed, individuales).
+
+    Devuelve un dict con paginas (las leídas), discrepancias, segundos y paginas_seg.
+    """
+    inicio = time.perf_counter()
+    paginas, errores = 0, []
+    if not individuales:
+        try:
+            total_paginas = len(PdfReader(path).pages)
+        except Exception as exc:
+            errores.append((None, None, "lectura", None, str(exc)))
+            total_paginas = 0
+        if total_paginas != n:
+            errores.append((None, None, "paginas", n, total_paginas))
+        if total_paginas == 0:
+            # Sin documento legible no hay nada que repartir entre los procesos
+            segundos = time.perf_counter() - inicio
+            return {"paginas": 0, "discrepancias": errores, "segundos": segundos, "paginas_seg": 0.0}
+
+    bloques = _bloques(_tareas(path, n, seed, individuales), bloque)
+    if procesos == 1:
+        resultados = map(_verificar_bloque, bloques)
+        for hechas, errs in resultados:
+            paginas += hechas
+            errores.extend(errs)
+        _LECTORES.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for hechas, errs in pool.map(_verificar_bloque, bloques):
+                paginas += hechas
+                errores.extend(errs)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "paginas": paginas,
+        "discrepancias": errores,
+        "segundos": segundos,
+        "paginas_seg": paginas / segundos if segundos > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica los totales impresos en facturas PDF.")
+    parser.add_argument("path", nargs="?", default="facturas_compras_200.pdf",
+                        help="PDF único a verificar (ignorado con --individuales).")
+    parser.add_argument("-n", type=int, default=200, help="Número de facturas generadas.")
+    parser.add_argument("--seed", type=int, default=7, help="Semilla usada al generar.")
+    parser.add_argument(
+        "--individuales",
+        type=int,
+        nargs="?",
+        const=10,
+        default=None,
+        help="Verifica N archivos factura_<i>.pdf. Si no se especifica N, se verifican 10."
+    )
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(),
+                        help="Procesos del pool de extracción (por defecto: nº de CPUs).")
+    args = parser.parse_args()
+
+    if args.individuales is not None:
+        res = verificar_pdf(n=args.individuales, seed=args.seed, individuales=True,
+                            procesos=args.procesos)
+    else:
+        res = verificar_pdf(args.path, n=args.n, seed=args.seed, procesos=args.procesos)
+
+    for pagina, numero, campo, esperado, impreso in res["discrepancias"][:50]:
+        print(f"ERROR pág. {pagina} ({numero}) {campo}: esperado {esperado}, impreso {impreso}")
+    if len(res["discrepancias"]) > 50:
+        print(f"... y {len(res['discrepancias']) - 50} discrepancias más")
+    estado = "OK" if not res["discrepancias"] else "FALLO"
+    print(f"{estado} -> {res['paginas']} páginas verificadas en {res['segundos']:.1f} s "
+          f"({res['paginas_seg']:.0f} pág/s), discrepancias: {len(res['discrepancias'])}")
+    raise SystemExit(0 if not res["discrepancias"] else 1)